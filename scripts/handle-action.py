@@ -8,31 +8,95 @@ import os
 import sys
 import argparse
 import subprocess
+import tempfile
+import contextlib
+import importlib.util
+import io
+
+# orjson is optional; fall back to stdlib json with the same compact output
+try:
+    import orjson
+    _loads, _dumps = orjson.loads, orjson.dumps
+except ImportError:
+    _loads = json.loads
+    def _dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
 
 STATE_FILE = os.path.expanduser("~/.openclaw-linkedin-state.json")
 
 
 def load_state():
-    if os.path.exists(STATE_FILE):
-        with open(STATE_FILE) as f:
-            return json.load(f)
-    return {"seen_messages": [], "pending_responses": []}
+    try:
+        with open(STATE_FILE, "rb") as f:
+            return _loads(f.read())
+    except FileNotFoundError:
+        return {"seen_messages": [], "pending_responses": []}
 
 
 def save_state(state):
-    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
-    with open(STATE_FILE, "w") as f:
-        json.dump(state, f, indent=2, ensure_ascii=False)
+    # Write to a unique temp file and rename, so an interrupted run never leaves a torn
+    # state file and concurrent writers (cron fetch + handle-action) don't share a temp path
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(STATE_FILE) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_dumps(state))
+        os.replace(tmp, STATE_FILE)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def split_pending(state, chat_id):
+    """Partition pending responses into (matching chat_id, others) in one pass."""
+    matching, others = [], []
+    for p in state.get("pending_responses", []):
+        (matching if p["chat_id"] == chat_id else others).append(p)
+    return matching, others
+
+
+def run_send_response(chat_id, message):
+    """Send a message and archive the chat via send-response.py.
+    
+    The script is loaded in-process to avoid paying a second interpreter
+    startup; if it can't be imported, fall back to running it as a subprocess.
+    
+    Returns:
+        tuple: (success, stderr output)
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    send_script = os.path.join(script_dir, "send-response.py")
+    
+    try:
+        spec = importlib.util.spec_from_file_location("send_response", send_script)
+        send_response = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(send_response)
+    except (ImportError, OSError, AttributeError) as e:
+        # AttributeError: spec_from_file_location returned no spec/loader
+        result = subprocess.run(
+            [sys.executable, send_script, "--chat-id", chat_id, "--message", message],
+            capture_output=True,
+            text=True
+        )
+        return result.returncode == 0, f"(in-process load failed: {e})\n{result.stderr}"
+    
+    # Same escaped-newline handling as send-response.py's CLI
+    message = message.replace('\\n', '\n')
+    
+    # Keep send-response.py's progress output quiet, as capture_output did
+    out, err = io.StringIO(), io.StringIO()
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+        success = send_response.send_and_archive(chat_id, message)
+    return success, err.getvalue()
 
 
 def handle_ignore(chat_id):
     """Mark message as ignored (remove from pending)."""
     state = load_state()
-    pending = state.get("pending_responses", [])
     
-    # Remove from pending
-    state["pending_responses"] = [p for p in pending if p["chat_id"] != chat_id]
-    save_state(state)
+    # Remove from pending (no rewrite if the chat wasn't pending)
+    matching, state["pending_responses"] = split_pending(state, chat_id)
+    if matching:
+        save_state(state)
     
     print(f"✅ Message ignoré (chat_id: {chat_id})")
     return True
@@ -41,10 +105,10 @@ def handle_ignore(chat_id):
 def handle_send(chat_id):
     """Send the suggested response and archive."""
     state = load_state()
-    pending = state.get("pending_responses", [])
+    matching, others = split_pending(state, chat_id)
     
     # Find the message
-    msg = next((p for p in pending if p["chat_id"] == chat_id), None)
+    msg = matching[0] if matching else None
     if not msg:
         print(f"❌ Message not found in pending (chat_id: {chat_id})", file=sys.stderr)
         return False
@@ -55,21 +119,14 @@ def handle_send(chat_id):
         return False
     
     # Send via send-response.py
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    send_script = os.path.join(script_dir, "send-response.py")
-    
-    result = subprocess.run(
-        [sys.executable, send_script, "--chat-id", chat_id, "--message", suggested_response],
-        capture_output=True,
-        text=True
-    )
+    success, errors = run_send_response(chat_id, suggested_response)
     
-    if result.returncode != 0:
-        print(f"❌ Failed to send: {result.stderr}", file=sys.stderr)
+    if not success:
+        print(f"❌ Failed to send: {errors}", file=sys.stderr)
         return False
     
     # Remove from pending
-    state["pending_responses"] = [p for p in pending if p["chat_id"] != chat_id]
+    state["pending_responses"] = others
     save_state(state)
     
     print(f"✅ Réponse envoyée et chat archivé (chat_id: {chat_id})")
@@ -100,25 +157,18 @@ def handle_modify(chat_id):
 def send_custom_response(chat_id, custom_message):
     """Send a custom response (user-provided) and archive."""
     state = load_state()
-    pending = state.get("pending_responses", [])
     
     # Send via send-response.py
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    send_script = os.path.join(script_dir, "send-response.py")
-    
-    result = subprocess.run(
-        [sys.executable, send_script, "--chat-id", chat_id, "--message", custom_message],
-        capture_output=True,
-        text=True
-    )
+    success, errors = run_send_response(chat_id, custom_message)
     
-    if result.returncode != 0:
-        print(f"❌ Failed to send: {result.stderr}", file=sys.stderr)
+    if not success:
+        print(f"❌ Failed to send: {errors}", file=sys.stderr)
         return False
     
-    # Remove from pending
-    state["pending_responses"] = [p for p in pending if p["chat_id"] != chat_id]
-    save_state(state)
+    # Remove from pending (no rewrite if the chat wasn't pending)
+    matching, state["pending_responses"] = split_pending(state, chat_id)
+    if matching:
+        save_state(state)
     
     print(f"✅ Réponse personnalisée envoyée et chat archivé (chat_id: {chat_id})")
     return True
@@ -2,62 +2,146 @@
 """LinkedIn message fetcher via Beeper MCP.
 Fetches unseen LinkedIn messages and returns them for AI judgment.
 """
-import json, os, re, urllib.request, logging, argparse
+import json, os, re, http.client, logging, argparse, tempfile, threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from urllib.parse import urlsplit
+
+# orjson is optional: 2-5x faster on MCP payloads, stdlib json otherwise
+try:
+    import orjson
+    _loads, _dumps = orjson.loads, orjson.dumps
+except ImportError:
+    _loads = json.loads
+    def _dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
 
 BEEPER_MCP_URL = os.environ.get("BEEPER_MCP_URL", "http://localhost:23373/v0/mcp")
 BEEPER_TOKEN   = os.environ.get("BEEPER_TOKEN", "d3970894-6957-4599-83df-6bf7899f4fb3")
 STATE_FILE     = os.environ.get("LINKEDIN_STATE", os.path.expanduser("~/.openclaw-linkedin-state.json"))
 LOG_FILE       = os.environ.get("LINKEDIN_LOG",   os.path.expanduser("~/logs/linkedin-spam-filter.log"))
 
-Path(LOG_FILE).parent.mkdir(parents=True, exist_ok=True)
-logging.basicConfig(filename=LOG_FILE, level=logging.INFO, format="[%(asctime)s] %(levelname)s: %(message)s")
 log = logging.getLogger()
 
 
+def _setup_logging():
+    """Create the log directory and attach the file handler (only for paths that log)."""
+    Path(LOG_FILE).parent.mkdir(parents=True, exist_ok=True)
+    logging.basicConfig(filename=LOG_FILE, level=logging.INFO, format="[%(asctime)s] %(levelname)s: %(message)s")
+
+
+# search_chats returns markdown: ## Name (chatID: ...)
+_CHAT_RE = re.compile(r"## (.+?) \(chatID: ([^)]+)\)")
+
+
 # ---------------------------------------------------------------------------
 # State
 # ---------------------------------------------------------------------------
 
 def load_state():
-    if os.path.exists(STATE_FILE):
-        with open(STATE_FILE) as f:
-            return json.load(f)
-    return {"seen_messages": [], "pending_responses": []}
+    try:
+        with open(STATE_FILE, "rb") as f:
+            return _loads(f.read())
+    except FileNotFoundError:
+        return {"seen_messages": [], "pending_responses": []}
 
 
 def save_state(state):
-    with open(STATE_FILE, "w") as f:
-        json.dump(state, f, indent=2, ensure_ascii=False)
+    # Write to a unique temp file and rename, so an interrupted run never leaves a torn
+    # state file and concurrent writers (cron fetch + handle-action) don't share a temp path
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(STATE_FILE) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_dumps(state))
+        os.replace(tmp, STATE_FILE)
+    except BaseException:
+        os.unlink(tmp)
+        raise
 
 
 # ---------------------------------------------------------------------------
 # Beeper MCP
 # ---------------------------------------------------------------------------
 
-def mcp_call(tool_name, params):
-    payload = json.dumps({
+_MCP_URL     = urlsplit(BEEPER_MCP_URL)
+_MCP_PATH    = _MCP_URL.path + (f"?{_MCP_URL.query}" if _MCP_URL.query else "")
+_MCP_HEADERS = {
+    "Content-Type": "application/json",
+    "Accept": "application/json, text/event-stream",
+    "Authorization": f"Bearer {BEEPER_TOKEN}",
+}
+# One keep-alive connection per thread (http.client connections aren't thread-safe),
+# plus whether it has already served a request
+_local = threading.local()
+
+
+def _connection():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        cls = http.client.HTTPSConnection if _MCP_URL.scheme == "https" else http.client.HTTPConnection
+        conn = _local.conn = cls(_MCP_URL.netloc, timeout=15)
+        _local.reused = False
+    return conn
+
+
+def _post(payload):
+    """POST to the MCP endpoint over this thread's keep-alive connection.
+
+    Streams the SSE body and returns the first ``data:`` frame (bytes), or None.
+    """
+    while True:
+        conn = _connection()
+        try:
+            conn.request("POST", _MCP_PATH, body=payload, headers=_MCP_HEADERS)
+            resp = conn.getresponse()
+            frame = None
+            if resp.status < 400:
+                for line in resp:
+                    if line.startswith(b"data: "):
+                        frame = line[6:]
+                        break
+            resp.read()  # drain the rest so the connection can be reused
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            # Server dropped an idle keep-alive connection: reconnect once
+            conn.close()
+            _local.conn = None
+            if not _local.reused:
+                raise
+            continue
+        except Exception:
+            conn.close()
+            _local.conn = None
+            raise
+        _local.reused = True
+        if resp.status >= 400:
+            raise http.client.HTTPException(f"HTTP {resp.status} {resp.reason}")
+        return frame
+
+
+def _rpc_body(tool_name, params):
+    return _dumps({
         "jsonrpc": "2.0", "id": 1, "method": "tools/call",
         "params": {"name": tool_name, "arguments": params}
-    }).encode()
-    req = urllib.request.Request(
-        BEEPER_MCP_URL, data=payload,
-        headers={
-            "Content-Type": "application/json",
-            "Accept": "application/json, text/event-stream",
-            "Authorization": f"Bearer {BEEPER_TOKEN}",
-        })
+    })
+
+
+# search_chats is called with the same arguments every run: encode it once
+_SEARCH_CHATS_BODY = _rpc_body("search_chats", {"query": "LinkedIn", "limit": 50, "unreadOnly": False})
+
+
+def mcp_call(tool_name, params=None, payload=None):
+    """Call an MCP tool. `payload` is an already-encoded request body, if any."""
+    if payload is None:
+        payload = _rpc_body(tool_name, params)
     try:
-        with urllib.request.urlopen(req, timeout=15) as resp:
-            raw = resp.read().decode()
-        for line in raw.split("\n"):
-            if line.startswith("data: "):
-                d = json.loads(line[6:])
-                if "error" in d:
-                    log.error(f"MCP error {tool_name}: {d['error']}")
-                    return None
-                text = d.get("result", {}).get("content", [{}])[0].get("text", "")
-                return _parse(text)
+        frame = _post(payload)
+        if frame:
+            d = _loads(frame)
+            if "error" in d:
+                log.error(f"MCP error {tool_name}: {d['error']}")
+                return None
+            text = d.get("result", {}).get("content", [{}])[0].get("text", "")
+            return _parse(text)
     except Exception as e:
         log.error(f"MCP {tool_name} failed: {e}")
     return None
@@ -65,23 +149,24 @@ def mcp_call(tool_name, params):
 
 def _parse(text):
     """Parse MCP response text: JSON object or markdown chat list."""
-    try:
-        data = json.loads(text)
-        # list_messages returns {items: [...]}
-        if "items" in data:
-            return {"messages": [{
-                "messageID":   i.get("id"),
-                "text":        i.get("text", ""),
-                "sender":      i.get("senderName", ""),
-                "isOwnMessage": i.get("isSender", False),
-                "timestamp":   i.get("timestamp"),
-            } for i in data["items"]]}
-        return data
-    except (json.JSONDecodeError, TypeError):
-        pass
-    # search_chats returns markdown: ## Name (chatID: ...)
+    # Sniff the first character so markdown bodies skip a doomed JSON parse
+    if text.lstrip()[:1] in ("{", "["):
+        try:
+            data = _loads(text)
+            # list_messages returns {items: [...]}
+            if "items" in data:
+                return {"messages": [{
+                    "messageID":   i.get("id"),
+                    "text":        i.get("text", ""),
+                    "sender":      i.get("senderName", ""),
+                    "isOwnMessage": i.get("isSender", False),
+                    "timestamp":   i.get("timestamp"),
+                } for i in data["items"]]}
+            return data
+        except (json.JSONDecodeError, TypeError):
+            pass
     chats = []
-    for m in re.finditer(r"## (.+?) \(chatID: ([^)]+)\)", text):
+    for m in _CHAT_RE.finditer(text):
         chats.append({"title": m.group(1).strip(), "chatID": m.group(2).strip()})
     return {"chats": chats}
 
@@ -93,18 +178,21 @@ def _parse(text):
 def fetch_messages(dry_run=False):
     """Fetch all new unseen LinkedIn messages. Pending messages are re-returned until confirmed."""
     state = load_state()
-    seen        = set(state.get("seen_messages", []))
+    # dict keeps insertion order, so trimming below drops the oldest ids
+    seen        = dict.fromkeys(state.get("seen_messages", []))
     pending_ids = {m.get("message_id") for m in state.get("pending_responses", [])}
+    seen_before = len(seen)
+
+    result = mcp_call("search_chats", payload=_SEARCH_CHATS_BODY)
+    chat_ids = [c["chatID"] for c in (result or {}).get("chats", []) if c.get("chatID")]
 
-    result = mcp_call("search_chats", {"query": "LinkedIn", "limit": 50, "unreadOnly": False})
-    chats = (result or {}).get("chats", [])
+    # list_messages calls are independent and I/O-bound: fetch them concurrently,
+    # then process results in order so state is only mutated from this thread
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        all_msgs = list(ex.map(lambda cid: mcp_call("list_messages", {"chatID": cid}), chat_ids))
 
     new_messages = []
-    for chat in chats:
-        chat_id = chat.get("chatID", "")
-        if not chat_id:
-            continue
-        msgs_result = mcp_call("list_messages", {"chatID": chat_id})
+    for chat_id, msgs_result in zip(chat_ids, all_msgs):
         if not msgs_result:
             continue
         for msg in msgs_result.get("messages", []):
@@ -113,7 +201,7 @@ def fetch_messages(dry_run=False):
                 continue
             if msg.get("isOwnMessage", False):
                 # Own messages: mark seen so we don't re-process
-                seen.add(mid)
+                seen[mid] = None
                 continue
             if mid in seen or mid in pending_ids:
                 # Already handled or already pending
@@ -128,7 +216,8 @@ def fetch_messages(dry_run=False):
             })
             log.info(f"New message from {msg.get('sender', '?')} (id={mid})")
 
-    if not dry_run:
+    # Skip the rewrite on the common "nothing new" run
+    if not dry_run and (new_messages or len(seen) != seen_before):
         state["seen_messages"] = list(seen)[-2000:]
         if new_messages:
             state["pending_responses"] = state.get("pending_responses", []) + new_messages
@@ -181,10 +270,13 @@ def main():
     args = parser.parse_args()
 
     if args.ignore:
+        # State-only path: no MCP calls, nothing to log
         ignore_message(args.ignore)
         print("ignored")
         return
 
+    _setup_logging()
+
     if args.reply_to and args.message:
         send_reply(args.reply_to, args.message)
         print("sent")
@@ -6,12 +6,94 @@ send-response.py — Send LinkedIn response and archive chat via Beeper MCP.
 import json
 import os
 import sys
-import urllib.request
+import http.client
 import argparse
+from urllib.parse import urlsplit
+
+# orjson is optional; it returns bytes directly, skipping the encode() copy
+try:
+    import orjson
+    _dumps = orjson.dumps
+except ImportError:
+    def _dumps(obj):
+        return json.dumps(obj).encode('utf-8')
 
 BEEPER_MCP_URL = os.environ.get("BEEPER_MCP_URL", "http://localhost:23373/v0/mcp")
 BEEPER_TOKEN = os.environ.get("BEEPER_TOKEN", "d3970894-6957-4599-83df-6bf7899f4fb3")
 
+MCP_URL = urlsplit(BEEPER_MCP_URL)
+MCP_PATH = MCP_URL.path + (f"?{MCP_URL.query}" if MCP_URL.query else "")
+MCP_HEADERS = {
+    "Authorization": f"Bearer {BEEPER_TOKEN}",
+    "Content-Type": "application/json",
+    "Accept": "application/json, text/event-stream"
+}
+
+# send_message and archive_chat share one keep-alive connection
+_connection = None
+_connection_reused = False
+
+
+def get_connection():
+    """Return the keep-alive connection to the MCP server, opening it on first use."""
+    global _connection, _connection_reused
+    if _connection is None:
+        conn_class = http.client.HTTPSConnection if MCP_URL.scheme == "https" else http.client.HTTPConnection
+        _connection = conn_class(MCP_URL.netloc, timeout=30)
+        _connection_reused = False
+    return _connection
+
+
+def close_connection():
+    """Drop the keep-alive connection (next call reconnects)."""
+    global _connection
+    if _connection is not None:
+        _connection.close()
+        _connection = None
+
+
+def post(payload):
+    """POST a JSON-RPC body over the keep-alive connection.
+    
+    Returns the first SSE data frame, or the whole body for plain responses.
+    """
+    global _connection_reused
+    while True:
+        conn = get_connection()
+        try:
+            conn.request("POST", MCP_PATH, body=payload, headers=MCP_HEADERS)
+            response = conn.getresponse()
+            
+            # Stream the SSE body and stop at the first data frame
+            body = []
+            result = None
+            if response.status < 400:
+                for line in response:
+                    if line.startswith(b'data: '):
+                        result = line[6:]
+                        break
+                    body.append(line)
+            
+            # Drain whatever is left so the next call can reuse the connection
+            rest = response.read()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            # Server closed the kept-alive socket: reconnect once
+            close_connection()
+            if not _connection_reused:
+                raise
+            continue
+        except Exception:
+            close_connection()
+            raise
+        
+        _connection_reused = True
+        if response.status >= 400:
+            raise http.client.HTTPException(f"HTTP Error {response.status}: {response.reason}")
+        if result is None:
+            # Plain (non-SSE) response: return it whole
+            result = b''.join(body) + rest
+        return result.decode('utf-8')
+
 
 def mcp_call(tool_name, arguments):
     """Call a Beeper MCP tool via HTTP JSON-RPC (SSE format)."""
@@ -25,23 +107,8 @@ def mcp_call(tool_name, arguments):
         }
     }
     
-    headers = {
-        "Authorization": f"Bearer {BEEPER_TOKEN}",
-        "Content-Type": "application/json",
-        "Accept": "application/json, text/event-stream"
-    }
-    
     try:
-        req = urllib.request.Request(
-            BEEPER_MCP_URL,
-            data=json.dumps(request_data).encode('utf-8'),
-            headers=headers,
-            method='POST'
-        )
-        
-        with urllib.request.urlopen(req, timeout=30) as response:
-            return response.read().decode('utf-8')
-            
+        return post(_dumps(request_data))
     except Exception as e:
         print(f"Error calling {tool_name}: {e}", file=sys.stderr)
         return None